@@ -4,11 +4,9 @@ import glob
 import os
 import time
 
-import geomstats.backend as gs
 import numpy as np
 import torch
 import trimesh
-from geomstats.geometry.discrete_surfaces import DiscreteSurfaces
 
 import H2_SurfaceMatch.H2_match  # noqa: E402
 import H2_SurfaceMatch.utils.input_output as h2_io  # noqa: E402
@@ -28,9 +26,17 @@ def remove_degenerate_faces(vertices, faces, vertex_colors, area_threshold=0.01)
     """
     mesh = trimesh.Trimesh(vertices=vertices, faces=faces, vertex_colors=vertex_colors)
 
-    discrete_surfaces = DiscreteSurfaces(faces=faces)
-    face_areas = discrete_surfaces.face_areas(gs.array(vertices))
-    face_mask = ~gs.less(face_areas, area_threshold)
+    # The face areas are the volume areas of the surface metric, i.e. the norms
+    # of the cross products of two edges of the faces, computed in numpy.
+    face_vertices = np.asarray(vertices)[np.asarray(faces)]
+    face_areas = np.linalg.norm(
+        np.cross(
+            face_vertices[:, 1] - face_vertices[:, 0],
+            face_vertices[:, 2] - face_vertices[:, 0],
+        ),
+        axis=-1,
+    )
+    face_mask = ~np.less(face_areas, area_threshold)
     mesh.update_faces(face_mask)
     return mesh.vertices, mesh.faces, mesh.visual.vertex_colors
 
@@ -3,14 +3,122 @@
 Lead authors: Emmanuel Hartman, Adele Myers.
 """
 
-import math
-
 import geomstats.backend as gs
 import torch
 from geomstats.geometry.euclidean import Euclidean
 from geomstats.geometry.manifold import Manifold
 from geomstats.geometry.riemannian_metric import RiemannianMetric
-from geomstats.numerics.optimizers import ScipyMinimize
+from scipy.optimize import OptimizeResult
+
+
+def _trace_of_product(mat_a, mat_b):
+    """Compute the trace of the matrix product of two batches of matrices.
+
+    The trace of AB is the sum of the entries of the element-wise product of
+    A with the transpose of B, which avoids forming the full matrix product.
+
+    Parameters
+    ----------
+    mat_a : array-like, shape=[..., n, m]
+        First matrices.
+    mat_b : array-like, shape=[..., m, n]
+        Second matrices.
+
+    Returns
+    -------
+    _ : array-like, shape=[...]
+        Traces of the products of the matrices.
+    """
+    return gs.sum(mat_a * gs.moveaxis(mat_b, -1, -2), axis=(-2, -1))
+
+
+def _det_2x2(mat):
+    """Compute the determinant of a batch of 2x2 matrices in closed form.
+
+    Parameters
+    ----------
+    mat : array-like, shape=[..., 2, 2]
+        Matrices.
+
+    Returns
+    -------
+    _ : array-like, shape=[...]
+        Determinants of the matrices.
+    """
+    return mat[..., 0, 0] * mat[..., 1, 1] - mat[..., 0, 1] * mat[..., 1, 0]
+
+
+def _inv_2x2(mat):
+    """Compute the inverse of a batch of 2x2 matrices in closed form.
+
+    Unlike gs.linalg.inv, a singular matrix does not raise: its inverse is
+    returned with inf or nan entries. The surface metrics of degenerate faces
+    are singular, and their determinants are not clipped, so the meshes are
+    expected to be free of such faces, see remove_degenerate_faces.
+
+    Parameters
+    ----------
+    mat : array-like, shape=[..., 2, 2]
+        Invertible matrices.
+
+    Returns
+    -------
+    _ : array-like, shape=[..., 2, 2]
+        Inverses of the matrices.
+    """
+    adjugate = gs.stack(
+        [mat[..., 1, 1], -mat[..., 0, 1], -mat[..., 1, 0], mat[..., 0, 0]], axis=-1
+    )
+    adjugate = gs.reshape(adjugate, mat.shape)
+    return adjugate / _det_2x2(mat)[..., None, None]
+
+
+class _SparseMatVec(torch.autograd.Function):
+    """Product of a sparse matrix with a batch of vector fields.
+
+    The matrix is given by its entries (rows, cols) and their weights. The
+    backward pass is computed in closed form: the gradient with respect to
+    the vector fields is the product with the transposed matrix, and the one
+    with respect to the weights is a single contraction. Only the inputs are
+    saved for the backward pass, not the gathered values of the entries.
+    """
+
+    @staticmethod
+    def forward(ctx, weights, rows, cols, vec):
+        """Compute the product of the matrix with the vector fields.
+
+        Parameters
+        ----------
+        weights : array-like, shape=[n_entries]
+            Weights of the entries of the matrix.
+        rows : array-like, shape=[n_entries]
+            Row indices of the entries of the matrix.
+        cols : array-like, shape=[n_entries]
+            Column indices of the entries of the matrix.
+        vec : array-like, shape=[n_vertices, n_channels]
+            Vector fields, with their vertices along the first axis.
+
+        Returns
+        -------
+        _ : array-like, shape=[n_vertices, n_channels]
+            Products of the matrix with the vector fields.
+        """
+        ctx.save_for_backward(weights, rows, cols, vec)
+        values = weights[:, None] * vec[cols]
+        return gs.zeros(vec.shape, dtype=values.dtype, device=vec.device).index_add(
+            0, rows, values
+        )
+
+    @staticmethod
+    def backward(ctx, grad):
+        """Compute the gradients with respect to the weights and vectors."""
+        weights, rows, cols, vec = ctx.saved_tensors
+        grad_weights = grad_vec = None
+        if ctx.needs_input_grad[0]:
+            grad_weights = gs.sum(grad[rows] * vec[cols], axis=-1)
+        if ctx.needs_input_grad[3]:
+            grad_vec = _SparseMatVec.apply(weights, cols, rows, grad)
+        return grad_weights, None, None, grad_vec
 
 
 class DiscreteSurfaces(Manifold):
@@ -33,21 +141,55 @@ class DiscreteSurfaces(Manifold):
     faces : integer array-like, shape=[n_faces, 3]
         Triangulation of the surface.
         Each face is given by 3 indices that indicate its vertices.
+    device : str or torch.device
+        Device on which the faces, and the index tensors derived from them,
+        are stored. The surfaces should be given on the same device.
+        Optional, default: None, i.e. the device of the faces.
+    dtype : torch.dtype
+        Floating dtype, e.g. torch.float32, in which the elastic metric
+        computes its inner-products. The surfaces and tangent vectors are
+        cast to it before the computation.
+        Optional, default: None, i.e. the dtype of the surfaces.
     """
 
     def __init__(
         self,
         faces,
         equip=True,
+        device=None,
+        dtype=None,
     ):
         ambient_dim = 3
         self.ambient_manifold = Euclidean(dim=ambient_dim)
-        self.faces = faces
+        # The index tensors are kept in int64: on CPU, index_add with int32
+        # indices is several times slower than with int64 ones.
+        self.int_dtype = torch.int64
+        self.faces = gs.array(faces).to(self.int_dtype)
+        if device is not None:
+            self.faces = self.faces.to(device)
+        self.device = self.faces.device
         self.n_faces = len(faces)
         self.n_vertices = int(gs.amax(self.faces) + 1)
         self.shape = (self.n_vertices, ambient_dim)
-        self.dtype = torch.float32
-        self.int_dtype = torch.int32
+        self.dtype = dtype
+
+        # The topology of the mesh is fixed: index tensors are built only once.
+        # Vertex ids of the faces, ordered as the areas tiled by vertex_areas.
+        self._vertex_areas_id_vertices = gs.flatten(gs.transpose(self.faces))
+        # Vertex ids of the edges 12, 20, 01 of each face, used by laplacian.
+        self._laplacian_id_vertices = gs.reshape(
+            gs.stack([self.faces[:, [1, 2, 0]], self.faces[:, [2, 0, 1]]], axis=0),
+            (2, self.n_faces * 3),
+        )
+        # Sparsity pattern of the Laplacian: the entries (id_1, id_0) of the
+        # edges and the diagonal entries (id_1, id_1), without duplicates.
+        # Each of the 6 * n_faces raw entries is mapped to its unique slot.
+        id_vertices = self._laplacian_id_vertices
+        entries = gs.concatenate([id_vertices[1], id_vertices[1]]) * self.n_vertices
+        entries = entries + gs.concatenate([id_vertices[0], id_vertices[1]])
+        entries, self._laplacian_id_entries = torch.unique(entries, return_inverse=True)
+        self._laplacian_rows = entries // self.n_vertices
+        self._laplacian_cols = entries % self.n_vertices
         super().__init__(
             dim=self.n_vertices * ambient_dim,
             shape=(self.n_vertices, 3),
@@ -163,8 +305,8 @@ class DiscreteSurfaces(Manifold):
         vertices = gs.reshape(vertices, (n_samples, self.n_vertices, 3))
         return vertices[0] if n_samples == 1 else vertices
 
-    def _vertices(self, point):
-        """Extract 3D vertices coordinates corresponding to each face.
+    def _face_vertices(self, point):
+        """Gather the 3D coordinates of the vertices of each face at once.
 
         Parameters
         ----------
@@ -173,31 +315,42 @@ class DiscreteSurfaces(Manifold):
 
         Returns
         -------
-        vertices : tuple of vertex_0, vertex_1, vertex_2 where:
-            vertex_i : array-like, shape=[..., n_faces, 3]
-                3D coordinates of the ith vertex of that face.
+        face_vertices : array-like, shape=[..., n_faces, 3, 3]
+            3D coordinates of the vertices 0, 1, 2 of each face.
+        """
+        return point[..., self.faces, :]
+
+    @staticmethod
+    def _sq_len_edges_from_one_forms(one_forms):
+        """Compute the squared edge lengths directly from the one forms.
+
+        This function is useful for efficiency purposes.
+
+        Parameters
+        ----------
+        one_forms : array-like, shape=[..., n_faces, 2, 3]
+            One forms evaluated at each face of the triangulated surface.
+
+        Returns
+        -------
+        sq_len_edges : array-like, shape=[..., n_faces, 3]
+            Squared lengths of the edges 12, 02 and 01 of each face.
         """
-        vertex = []
-        for i in range(3):
-            if point.ndim == 2:
-                vertex_i = [point[index, :] for index in self.faces[:, i]]
-            if point.ndim == 3:
-                vertex_i = [point[:, index, :] for index in self.faces[:, i]]
-            vertex.append(gs.stack(vertex_i, axis=-2))
-        vertex_0, vertex_1, vertex_2 = vertex
-
-        if point.ndim == 3 and vertex_0.ndim == 2:
-            vertex_0 = gs.expand_dims(vertex_0, axis=0)
-            vertex_1 = gs.expand_dims(vertex_1, axis=0)
-            vertex_2 = gs.expand_dims(vertex_2, axis=0)
-        return vertex_0, vertex_1, vertex_2
+        edge_01, edge_02 = one_forms[..., 0, :], one_forms[..., 1, :]
+        return gs.stack(
+            [
+                gs.sum((edge_02 - edge_01) ** 2, axis=-1),
+                gs.sum(edge_02**2, axis=-1),
+                gs.sum(edge_01**2, axis=-1),
+            ],
+            axis=-1,
+        )
 
     def _triangle_areas(self, point):
         """Compute triangle areas for each face of the surface.
 
-        Heron's formula gives the triangle's area in terms of its sides a b c:,
-        As the square root of the product s(s - a)(s - b)(s - c),
-        where s is the semiperimeter of the triangle s = (a + b + c)/2.
+        The area of a triangle is half the norm of the cross product of two
+        of its edges, i.e. the norm of the normal of the face.
 
         Parameters
         ----------
@@ -206,22 +359,29 @@ class DiscreteSurfaces(Manifold):
 
         Returns
         -------
-        _ : array-like, shape=[..., n_faces, 1]
+        _ : array-like, shape=[..., n_faces]
             Triangle area of each face.
         """
-        vertex_0, vertex_1, vertex_2 = self._vertices(point)
-        len_edge_12 = gs.linalg.norm((vertex_1 - vertex_2), axis=-1)
-        len_edge_02 = gs.linalg.norm((vertex_0 - vertex_2), axis=-1)
-        len_edge_01 = gs.linalg.norm((vertex_0 - vertex_1), axis=-1)
-        half_perimeter = 0.5 * (len_edge_12 + len_edge_02 + len_edge_01)
-        return gs.sqrt(
-            (
-                half_perimeter
-                * (half_perimeter - len_edge_12)
-                * (half_perimeter - len_edge_02)
-                * (half_perimeter - len_edge_01)
-            ).clip(min=1e-6)
-        )
+        return self._triangle_areas_from_normals(self.normals(point))
+
+    @staticmethod
+    def _triangle_areas_from_normals(normals):
+        """Compute the triangle areas directly from the normals.
+
+        The squared area is clipped away from zero, so that degenerate faces
+        do not produce infinite cotangent weights in the laplacian.
+
+        Parameters
+        ----------
+        normals : array-like, shape=[..., n_faces, 3]
+            Normals of each face of the mesh.
+
+        Returns
+        -------
+        _ : array-like, shape=[..., n_faces]
+            Triangle area of each face.
+        """
+        return gs.sqrt(gs.sum(normals**2, axis=-1).clip(min=1e-6))
 
     def vertex_areas(self, point):
         """Compute vertex areas for a triangulated surface.
@@ -240,26 +400,30 @@ class DiscreteSurfaces(Manifold):
         vertex_areas :  array-like, shape=[..., n_vertices, 1] # QUESTION function is not outputing this dimension.
             Vertex area for each vertex.
         """
-        batch_shape = point.shape[:-2]
-        n_vertices = point.shape[-2]
-        n_faces = self.faces.shape[0]
-        area = self._triangle_areas(point)
-        id_vertices = gs.broadcast_to(
-            gs.flatten(self.faces), batch_shape + (math.prod(self.faces.shape),)
-        )
-        incident_areas = gs.zeros(batch_shape + (n_vertices,))
-        val = gs.reshape(
-            gs.broadcast_to(gs.expand_dims(area, axis=-2), batch_shape + (3, n_faces)),
-            batch_shape + (-1,),
-        )
+        return self._vertex_areas_from_triangle_areas(self._triangle_areas(point))
 
-        # Added lines: to make GPU compatible
-        incident_areas = incident_areas.to(point.device, dtype=self.dtype)
-        id_vertices = id_vertices.to(point.device)
-        val = val.to(point.device, dtype=self.dtype)
+    def _vertex_areas_from_triangle_areas(self, area):
+        """Compute the vertex areas directly from the triangle areas.
 
-        incident_areas = gs.scatter_add(
-            incident_areas, dim=len(batch_shape), index=id_vertices, src=val
+        This function is useful for efficiency purposes.
+
+        Parameters
+        ----------
+        area : array-like, shape=[..., n_faces]
+            Triangle area of each face.
+
+        Returns
+        -------
+        vertex_areas :  array-like, shape=[..., n_vertices]
+            Vertex area for each vertex.
+        """
+        batch_shape = area.shape[:-1]
+        incident_areas = gs.zeros(
+            batch_shape + (self.n_vertices,), dtype=area.dtype, device=area.device
+        )
+        val = gs.concatenate([area, area, area], axis=-1)
+        incident_areas = incident_areas.index_add(
+            -1, self._vertex_areas_id_vertices.to(area.device), val
         )
         vertex_areas = 2 * incident_areas / 3.0
 
@@ -281,9 +445,25 @@ class DiscreteSurfaces(Manifold):
         normals_at_point : array-like, shape=[n_faces, 3]
             Normals of each face of the mesh.
         """
-        vertex_0, vertex_1, vertex_2 = self._vertices(point)
-        normals_at_point = 0.5 * gs.cross(vertex_1 - vertex_0, vertex_2 - vertex_0)
-        return normals_at_point
+        return self._normals_from_one_forms(self.surface_one_forms(point))
+
+    @staticmethod
+    def _normals_from_one_forms(one_forms):
+        """Compute the normals directly from the one forms.
+
+        This function is useful for efficiency purposes.
+
+        Parameters
+        ----------
+        one_forms : array-like, shape=[..., n_faces, 2, 3]
+            One forms evaluated at each face of the triangulated surface.
+
+        Returns
+        -------
+        normals_at_point : array-like, shape=[..., n_faces, 3]
+            Normals of each face of the mesh.
+        """
+        return 0.5 * gs.cross(one_forms[..., 0, :], one_forms[..., 1, :])
 
     def surface_one_forms(self, point):
         """Compute the vector valued one-forms.
@@ -303,16 +483,16 @@ class DiscreteSurfaces(Manifold):
         one_forms_bp : array-like, shape=[..., n_faces, 2, 3]
             One form evaluated at each face of the triangulated surface.
         """
-        vertex_0, vertex_1, vertex_2 = self._vertices(point)
-        one_forms = gs.stack([vertex_1 - vertex_0, vertex_2 - vertex_0], axis=-2)
-        return one_forms
+        face_vertices = self._face_vertices(point)
+        return face_vertices[..., 1:, :] - face_vertices[..., :1, :]
 
     def face_areas(self, point):
         """Compute the areas for each face of a triangulated surface.
 
         The corresponds to the volume area for the surface metric, that is
         the volume area of the pullback metric of the immersion defining the
-        surface metric.
+        surface metric. The square root of its determinant is the norm of the
+        cross product of two edges of the face, i.e. twice the norm of its normal.
 
         Parameters
         ----------
@@ -324,8 +504,7 @@ class DiscreteSurfaces(Manifold):
         _ : array-like, shape=[n_faces,]
             Area computed at each face of the triangulated surface.
         """
-        surface_metrics_bp = self.surface_metric_matrices(point)
-        return gs.sqrt(gs.linalg.det(surface_metrics_bp))
+        return 2 * gs.linalg.norm(self.normals(point), axis=-1)
 
     @staticmethod
     def _surface_metric_matrices_from_one_forms(one_forms):
@@ -344,10 +523,7 @@ class DiscreteSurfaces(Manifold):
             Surface metric matrices evaluated at each face of
             the triangulated surface.
         """
-        ndim = one_forms.ndim
-        transpose_axes = tuple(range(ndim - 2)) + tuple(reversed(range(ndim - 2, ndim)))
-        transposed_one_forms = gs.transpose(one_forms, axes=transpose_axes)
-        return gs.matmul(one_forms, transposed_one_forms)
+        return gs.einsum("...ij,...kj->...ik", one_forms, one_forms)
 
     def surface_metric_matrices(self, point):
         """Compute the surface metric matrices.
@@ -383,7 +559,7 @@ class DiscreteSurfaces(Manifold):
 
         Parameters
         ----------
-        point :  array-like, shape=[n_vertices, 3]
+        point :  array-like, shape=[..., n_vertices, 3]
             Surface, as the 3D coordinates of the vertices of its triangulation.
 
         Returns
@@ -392,36 +568,63 @@ class DiscreteSurfaces(Manifold):
             Function that evaluates the mesh Laplacian operator at a
             tangent vector field to the surface.
         """
-        n_vertices, n_faces = point.shape[-2], self.faces.shape[0]
-        vertex_0, vertex_1, vertex_2 = self._vertices(point)
-        len_edge_12 = gs.linalg.norm((vertex_1 - vertex_2), axis=-1)
-        len_edge_02 = gs.linalg.norm((vertex_0 - vertex_2), axis=-1)
-        len_edge_01 = gs.linalg.norm((vertex_0 - vertex_1), axis=-1)
-
-        half_perimeter = 0.5 * (len_edge_12 + len_edge_02 + len_edge_01)
-        area = gs.sqrt(
-            (
-                half_perimeter
-                * (half_perimeter - len_edge_12)
-                * (half_perimeter - len_edge_02)
-                * (half_perimeter - len_edge_01)
-            ).clip(min=1e-6)
+        one_forms = self.surface_one_forms(point)
+        area = self._triangle_areas_from_normals(
+            self._normals_from_one_forms(one_forms)
         )
-        sq_len_edge_12, sq_len_edge_02, sq_len_edge_01 = (
-            len_edge_12 * len_edge_12,
-            len_edge_02 * len_edge_02,
-            len_edge_01 * len_edge_01,
+        return self._laplacian_from_face_geometry(
+            self._sq_len_edges_from_one_forms(one_forms), area
         )
-        cot_12 = (sq_len_edge_02 + sq_len_edge_01 - sq_len_edge_12) / area
-        cot_02 = (sq_len_edge_12 + sq_len_edge_01 - sq_len_edge_02) / area
-        cot_01 = (sq_len_edge_12 + sq_len_edge_02 - sq_len_edge_01) / area
-        cot = gs.stack([cot_12, cot_02, cot_01], axis=1)
-        cot /= 2.0
-        id_vertices_120 = self.faces[:, [1, 2, 0]]
-        id_vertices_201 = self.faces[:, [2, 0, 1]]
-        id_vertices = gs.reshape(
-            gs.stack([id_vertices_120, id_vertices_201], axis=0), (2, n_faces * 3)
+
+    def _laplacian_from_face_geometry(self, sq_len_edges, area):
+        """Compute the mesh Laplacian operator directly from the face geometry.
+
+        This function is useful for efficiency purposes.
+
+        Parameters
+        ----------
+        sq_len_edges : array-like, shape=[..., n_faces, 3]
+            Squared lengths of the edges 12, 02 and 01 of each face.
+        area : array-like, shape=[..., n_faces]
+            Triangle area of each face.
+
+        Returns
+        -------
+        _laplacian : callable
+            Function that evaluates the mesh Laplacian operator at a
+            tangent vector field to the surface.
+        """
+        n_vertices, n_faces = self.n_vertices, self.faces.shape[0]
+        # The weight of each edge is the sum of the squared lengths of the two
+        # other edges minus its own, i.e. the total minus twice its own,
+        # divided by twice the area of the face.
+        sum_sq_len_edges = gs.sum(sq_len_edges, axis=-1, keepdims=True)
+        cot = (sum_sq_len_edges - 2 * sq_len_edges) / (2 * area[..., None])
+        batch_shape = cot.shape[:-2]
+        cot = gs.reshape(cot, (-1, n_faces * 3))
+        n_base_points = len(cot)
+
+        # The Laplacian of each base point is assembled once as a sparse
+        # matrix, block-diagonal across base points: the entry (id_1, id_0)
+        # carries the cotangent weight of the edge, and the diagonal entry
+        # (id_1, id_1) carries its opposite. Its sparsity pattern only depends
+        # on the faces, so the weights are accumulated into the precomputed
+        # entries. It is applied as a gather of its columns and an
+        # accumulation into its rows, whose gradient with respect to the
+        # weights stays sparse, unlike the one of sparse.mm.
+        id_entries = self._laplacian_id_entries.to(cot.device)
+        weights = gs.zeros(
+            (n_base_points, len(self._laplacian_rows)),
+            dtype=cot.dtype,
+            device=cot.device,
         )
+        weights = weights.index_add(1, id_entries, gs.concatenate([cot, -cot], -1))
+        weights = gs.flatten(weights)
+        offsets = gs.reshape(
+            gs.arange(n_base_points, device=cot.device) * n_vertices, (-1, 1)
+        )
+        rows = gs.flatten(self._laplacian_rows.to(cot.device) + offsets)
+        cols = gs.flatten(self._laplacian_cols.to(cot.device) + offsets)
 
         def _laplacian(tangent_vec):
             """Evaluate the mesh Laplacian operator.
@@ -443,55 +646,38 @@ class DiscreteSurfaces(Manifold):
                 Mesh Laplacian operator of the triangulated surface applied
                 to one its tangent vector tangent_vec.
             """
-            to_squeeze = False
-            if tangent_vec.ndim == 2:
-                tangent_vec = gs.expand_dims(tangent_vec, axis=0)
-                to_squeeze = True
-            n_tangent_vecs = len(tangent_vec)
-            tangent_vec_diff = (
-                tangent_vec[:, id_vertices[0]] - tangent_vec[:, id_vertices[1]]
-            )
-            values = gs.einsum(
-                "bd,nbd->nbd", gs.stack([gs.flatten(cot)] * 3, axis=1), tangent_vec_diff
-            )
-
-            laplacian_at_tangent_vec = gs.zeros((n_tangent_vecs, n_vertices, 3))
-
-            id_vertices_201_repeated = gs.tile(id_vertices[1, :], (n_tangent_vecs, 1))
-
-            laplacian_at_tangent_vec = laplacian_at_tangent_vec.to(
-                tangent_vec.device, dtype=self.int_dtype
-            )
-            id_vertices_201_repeated = id_vertices_201_repeated.to(
-                tangent_vec.device, dtype=torch.int64
-            )
-            values = values.to(dtype=self.int_dtype)
-
-            print("values dtype", values.dtype)
-            print("laplacian_at_tangent_vec dtype", laplacian_at_tangent_vec.dtype)
-            print("id_vertices_201_repeated dtype", id_vertices_201_repeated.dtype)
-            print("self dtype", self.dtype)
-
-            for i_dim in range(3):
-                laplacian_at_tangent_vec[:, :, i_dim] = gs.scatter_add(
-                    input=laplacian_at_tangent_vec[:, :, i_dim],
-                    dim=1,
-                    index=id_vertices_201_repeated,
-                    src=values[:, :, i_dim],
+            # The tangent vectors are flattened to a batch and their shape is
+            # restored at the end, whatever their number of dimensions.
+            if n_base_points > 1:
+                # The tangent vectors are stacked along the blocks of the matrix,
+                # i.e. along the batch axes of the base points, which are the
+                # last batch axes after broadcasting.
+                vec_batch_shape = torch.broadcast_shapes(
+                    tangent_vec.shape[:-2], batch_shape
                 )
-
-            laplacian_at_tangent_vec = (
-                gs.squeeze(laplacian_at_tangent_vec, axis=0)
-                if to_squeeze
-                else laplacian_at_tangent_vec
+                shape = (
+                    vec_batch_shape[: len(vec_batch_shape) - len(batch_shape)]
+                    + batch_shape
+                    + (n_vertices, 3)
+                )
+                tangent_vec = gs.reshape(
+                    gs.broadcast_to(tangent_vec, shape),
+                    (-1, n_base_points * n_vertices, 3),
+                )
+            else:
+                shape = tangent_vec.shape
+                tangent_vec = gs.reshape(tangent_vec, (-1, n_vertices, 3))
+            # The vertices are moved to the first axis, so that the entries
+            # of the matrix gather and accumulate contiguous rows.
+            n_vecs = len(tangent_vec)
+            tangent_vec = gs.reshape(gs.moveaxis(tangent_vec, 0, 1), (-1, n_vecs * 3))
+            laplacian_at_tangent_vec = _SparseMatVec.apply(
+                weights, rows, cols, tangent_vec
             )
-
-            return laplacian_at_tangent_vec.to(self.dtype)
-            # return (
-            #     gs.squeeze(laplacian_at_tangent_vec, axis=0)
-            #     if to_squeeze
-            #     else laplacian_at_tangent_vec
-            # )
+            laplacian_at_tangent_vec = gs.moveaxis(
+                gs.reshape(laplacian_at_tangent_vec, (-1, n_vecs, 3)), 0, 1
+            )
+            return gs.reshape(laplacian_at_tangent_vec, shape)
 
         return _laplacian
 
@@ -527,6 +713,11 @@ class ElasticMetric(RiemannianMetric):
     a2 : float
         Second order parameter.
         Default: 1.
+    face_dtype : torch.dtype
+        Reduced precision dtype, e.g. torch.bfloat16, in which the per-face
+        2x2 products of the terms a1, b1 and d1 are computed. Their sums over
+        the faces are still accumulated in the dtype of the base point.
+        Optional, default: None, i.e. the dtype of the base point.
 
     References
     ----------
@@ -535,7 +726,17 @@ class ElasticMetric(RiemannianMetric):
         arXiv:2204.04238 [cs.CV], 25 Sep 2022
     """
 
-    def __init__(self, space, a0=1.0, a1=1.0, b1=1.0, c1=1.0, d1=1.0, a2=1.0):
+    def __init__(
+        self,
+        space,
+        a0=1.0,
+        a1=1.0,
+        b1=1.0,
+        c1=1.0,
+        d1=1.0,
+        a2=1.0,
+        face_dtype=None,
+    ):
         super().__init__(space=space)
         self.a0 = a0
         self.a1 = a1
@@ -543,6 +744,7 @@ class ElasticMetric(RiemannianMetric):
         self.c1 = c1
         self.d1 = d1
         self.a2 = a2
+        self.face_dtype = face_dtype
 
         self.exp_solver = _ExpSolver(n_steps=10)
         self.log_solver = _LogSolver(n_steps=10)
@@ -565,7 +767,7 @@ class ElasticMetric(RiemannianMetric):
             Tangent vector at base point.
         tangent_vec_b : array-like, shape=[..., n_vertices, 3]
             Tangent vector at base point.
-        vertex_areas : array-like, shape=[n_vertices, 1]
+        vertex_areas : array-like, shape=[..., n_vertices]
             Vertex areas for each vertex of the base_point.
 
         Returns
@@ -579,16 +781,14 @@ class ElasticMetric(RiemannianMetric):
             Sobolev metrics: a comprehensive numerical framework".
             arXiv:2204.04238 [cs.CV], 25 Sep 2022.
         """
-        a0 = gs.array(self.a0)
-        a0 = a0.to(tangent_vec_a.device)
         return self.a0 * gs.sum(
             vertex_areas_bp
             * gs.einsum("...bi,...bi->...b", tangent_vec_a, tangent_vec_b),
             axis=-1,
         )
 
-    def _inner_product_a1(self, ginvdga, ginvdgb, areas_bp):
-        r"""Compute a1 term of order 1 within the inner-product.
+    def _inner_product_a1_b1(self, ginvdga, ginvdgb, areas_bp):
+        r"""Compute a1 and b1 terms of order 1 within the inner-product.
 
         Denote h and k the tangent vectors a and b respectively.
         Denote q the base point, i.e. the surface.
@@ -596,63 +796,29 @@ class ElasticMetric(RiemannianMetric):
         The equation of the inner-product is:
         :math:`\int_M (G_{a_0} + G_{a_1} + G_{b_1} + G_{c_1} + G_{d_1} + G_{a_2})vol_q`.
 
-        This method computes :math:`G_{a_1} = a_1.g_q^{-1} <dh_m, dk_m>`,
+        This method computes :math:`G_{a_1} = a_1.g_q^{-1} <dh_m, dk_m>`
+        and :math:`G_{b_1} = b_1.g_q^{-1} <dh_+, dk_+>`,
         with notations taken from .. [HSKCB2022].
 
-        Parameters
-        ----------
-        ginvdga : array-like, shape=[n_faces, 2, 2]
-            Product of the inverse of the surface metric matrices
-            with their differential at a.
-        ginvdgb : array-like, shape=[n_faces, 2, 2]
-            Product of the inverse of the surface metric matrices
-            with their differential at b.
-        areas_bp : array-like, shape=[n_faces,]
-            Areas of the faces of the surface given by the base point.
-
-        Returns
-        -------
-        _ : array-like, shape=[...]
-            Term of order 0, and coefficient a1, of the inner-product.
-
-        References
-        ----------
-        .. [HSKCB2022] "Elastic shape analysis of surfaces with second-order
-            Sobolev metrics: a comprehensive numerical framework".
-            arXiv:2204.04238 [cs.CV], 25 Sep 2022.
-        """
-        return self.a1 * gs.sum(
-            gs.einsum("...bii->...b", gs.matmul(ginvdga, ginvdgb)) * areas_bp,
-            axis=-1,
-        )
-
-    def _inner_product_b1(self, ginvdga, ginvdgb, areas_bp):
-        r"""Compute b1 term of order 1 within the inner-product.
-
-        Denote h and k the tangent vectors a and b respectively.
-        Denote q the base point, i.e. the surface.
-
-        The equation of the inner-product is:
-        :math:`\int_M (G_{a_0} + G_{a_1} + G_{b_1} + G_{c_1} + G_{d_1} + G_{a_2})vol_q`.
-
-        This method computes :math:`G_{b_1} = b_1.g_q^{-1} <dh_+, dk_+>`,
-        with notations taken from .. [HSKCB2022].
+        Both terms are computed from the same matrices, and are summed over
+        the faces at once.
 
         Parameters
         ----------
-        ginvdga : array-like, shape=[n_faces, 2, 2]
+        ginvdga : array-like, shape=[..., n_faces, 2, 2]
             Product of the inverse of the surface metric matrices
             with their differential at a.
-        ginvdgb : array-like, shape=[n_faces, 2, 2]
+        ginvdgb : array-like, shape=[..., n_faces, 2, 2]
             Product of the inverse of the surface metric matrices
             with their differential at b.
-        areas_bp : array-like, shape=[n_faces,]
+        areas_bp : array-like, shape=[..., n_faces]
             Areas of the faces of the surface given by the base point.
 
         Returns
         -------
         _ : array-like, shape=[...]
-            Term of order 0, and coefficient b1, of the inner-product.
+            Terms of order 1, and coefficients a1 and b1, of the
+            inner-product.
 
         References
         ----------
@@ -660,14 +826,18 @@ class ElasticMetric(RiemannianMetric):
             Sobolev metrics: a comprehensive numerical framework".
             arXiv:2204.04238 [cs.CV], 25 Sep 2022.
         """
-        return self.b1 * gs.sum(
-            gs.einsum("...bii->...b", ginvdga)
-            * gs.einsum("...bii->...b", ginvdgb)
+        trace_a = ginvdga[..., 0, 0] + ginvdga[..., 1, 1]
+        trace_b = ginvdgb[..., 0, 0] + ginvdgb[..., 1, 1]
+        return gs.sum(
+            (
+                self.a1 * _trace_of_product(ginvdga, ginvdgb)
+                + self.b1 * trace_a * trace_b
+            )
             * areas_bp,
             axis=-1,
         )
 
-    def _inner_product_c1(self, point_a, point_b, normals_bp, areas_bp):
+    def _inner_product_c1(self, normals_a, normals_b, normals_bp, areas_bp):
         r"""Compute c1 term of order 1 within the inner-product.
 
         Denote h and k the tangent vectors a and b respectively.
@@ -681,13 +851,13 @@ class ElasticMetric(RiemannianMetric):
 
         Parameters
         ----------
-        point_a : array-like, shape=[..., n_vertices, 3]
-            Point a corresponding to tangent vec a.
-        point_b : array-like, shape=[..., n_vertices, 3]
-            Point b corresponding to tangent vec b.
-        normals_bp : array-like, shape=[n_faces, 3]
+        normals_a : array-like, shape=[..., n_faces, 3]
+            Normals of each face of the point a corresponding to tangent vec a.
+        normals_b : array-like, shape=[..., n_faces, 3]
+            Normals of each face of the point b corresponding to tangent vec b.
+        normals_bp : array-like, shape=[..., n_faces, 3]
             Normals of each face of the surface given by the base point.
-        areas_bp : array-like, shape=[n_faces,]
+        areas_bp : array-like, shape=[..., n_faces]
             Areas of the faces of the surface given by the base point.
 
         Returns
@@ -701,15 +871,13 @@ class ElasticMetric(RiemannianMetric):
             Sobolev metrics: a comprehensive numerical framework".
             arXiv:2204.04238 [cs.CV], 25 Sep 2022.
         """
-        dna = self._space.normals(point_a) - normals_bp
-        dnb = self._space.normals(point_b) - normals_bp
+        dna = normals_a - normals_bp
+        dnb = normals_b - normals_bp
         return self.c1 * gs.sum(
             gs.einsum("...bi,...bi->...b", dna, dnb) * areas_bp, axis=-1
         )
 
-    def _inner_product_d1(
-        self, one_forms_a, one_forms_b, one_forms_bp, areas_bp, inv_surface_metrics_bp
-    ):
+    def _inner_product_d1(self, cross_one_forms_a, cross_one_forms_b, areas_bp):
         r"""Compute d1 term of order 1 within the inner-product.
 
         Denote h and k the tangent vectors a and b respectively.
@@ -723,16 +891,14 @@ class ElasticMetric(RiemannianMetric):
 
         Parameters
         ----------
-        one_forms_a : array-like, shape=[n_points, n_faces, 2, 3]
-            One forms at point a corresponding to tangent vec a.
-        one_forms_b : array-like, shape=[n_points, n_faces, 2, 3]
-            One forms at point b corresponding to tangent vec b.
-        one_forms_bp : array-like, shape=[n_faces, 2, 3]
-            One forms at base point.
-        areas_bp : array-like, shape=[n_faces,]
+        cross_one_forms_a : array-like, shape=[..., n_faces, 2, 2]
+            Product of the one forms of tangent vec a with the transposed one
+            forms at the base point.
+        cross_one_forms_b : array-like, shape=[..., n_faces, 2, 2]
+            Product of the one forms of tangent vec b with the transposed one
+            forms at the base point.
+        areas_bp : array-like, shape=[..., n_faces]
             Areas of the faces of the surface given by the base point.
-        inv_surface_metrics_bp : array-like, shape=[n_faces, 2, 2]
-            Inverses of the surface metric matrices at each face.
 
         Returns
         -------
@@ -745,40 +911,22 @@ class ElasticMetric(RiemannianMetric):
             Sobolev metrics: a comprehensive numerical framework".
             arXiv:2204.04238 [cs.CV], 25 Sep 2022.
         """
-        one_forms_bp_t = gs.transpose(one_forms_bp, (0, 2, 1))
-
-        one_forms_a_t = gs.transpose(one_forms_a, (0, 1, 3, 2))
-        xa = one_forms_a_t - one_forms_bp_t
-
-        xa_0 = gs.matmul(
-            gs.matmul(one_forms_bp_t, inv_surface_metrics_bp),
-            gs.matmul(gs.transpose(xa, (0, 1, 3, 2)), one_forms_bp_t)
-            - gs.matmul(one_forms_bp, xa),
-        )
-
-        one_forms_b_t = gs.transpose(one_forms_b, (0, 1, 3, 2))
-        xb = one_forms_b_t - one_forms_bp_t
-        xb_0 = gs.matmul(
-            gs.matmul(one_forms_bp_t, inv_surface_metrics_bp),
-            gs.matmul(gs.transpose(xb, (0, 1, 3, 2)), one_forms_bp_t)
-            - gs.matmul(one_forms_bp, xb),
-        )
-
-        return self.d1 * gs.sum(
-            gs.einsum(
-                "...bii->...b",
-                gs.matmul(
-                    xa_0,
-                    gs.matmul(
-                        inv_surface_metrics_bp, gs.transpose(xb_0, axes=(0, 1, 3, 2))
-                    ),
-                ),
-            )
-            * areas_bp
-        )
+        # With the one forms q at the base point, g = q q^T and the
+        # antisymmetric parts A = h q^T - q h^T and B = k q^T - q k^T, we have
+        # dh_0 = q^T g^{-1} A and dk_0 = q^T g^{-1} B. By cyclicity of the
+        # trace and since g^{-1} q q^T = I, the trace of
+        # dh_0 g^{-1} dk_0^T reduces to the trace of g^{-1} A g^{-1} B^T.
+        # A 2x2 antisymmetric matrix is A = a J, with J the rotation by a
+        # right angle, and M J M^T = det(M) J for any 2x2 matrix M, so that
+        # this trace is 2 a b det(g^{-1}). Since det(g) is the squared area
+        # of the face, the integrand is 2 a b / area.
+        antisym_a = cross_one_forms_a[..., 0, 1] - cross_one_forms_a[..., 1, 0]
+        antisym_b = cross_one_forms_b[..., 0, 1] - cross_one_forms_b[..., 1, 0]
+
+        return self.d1 * gs.sum(2 * antisym_a * antisym_b / areas_bp, axis=-1)
 
     def _inner_product_a2(
-        self, tangent_vec_a, tangent_vec_b, base_point, vertex_areas_bp
+        self, tangent_vec_a, tangent_vec_b, laplacian_at_base_point, vertex_areas_bp
     ):
         r"""Compute term of order 2 within the inner-product.
 
@@ -797,9 +945,9 @@ class ElasticMetric(RiemannianMetric):
             Tangent vector at base point.
         tangent_vec_b : array-like, shape=[..., n_vertices, 3]
             Tangent vector at base point.
-        base_point : array-like, shape=[..., n_vertices, 3]
-            Base point, a surface i.e. the 3D coordinates of its vertices.
-        vertex_areas_bp : array-like, shape=[..., n_vertices, 1]
+        laplacian_at_base_point : callable
+            Mesh Laplacian operator of the base_point.
+        vertex_areas_bp : array-like, shape=[..., n_vertices]
             Vertex areas for each vertex of the base_point.
 
         Returns
@@ -813,44 +961,13 @@ class ElasticMetric(RiemannianMetric):
             Sobolev metrics: a comprehensive numerical framework".
             arXiv:2204.04238 [cs.CV], 25 Sep 2022.
         """
-        # need_squeeze = False
-        if base_point.ndim == 2:
-            base_point = gs.expand_dims(base_point, axis=0)
-        if vertex_areas_bp.ndim == 1:
-            vertex_areas_bp = gs.expand_dims(vertex_areas_bp, axis=0)
-        if tangent_vec_a.ndim == 2:
-            # need_squeeze = True
-            tangent_vec_a = gs.expand_dims(tangent_vec_a, axis=0)
-        if tangent_vec_b.ndim == 2:
-            tangent_vec_b = gs.expand_dims(tangent_vec_b, axis=0)
-
-        einsum = []
-        for base_point_i, vertex_areas_bp_i, tangent_vec_a_i, tangent_vec_b_i in zip(
-            base_point, vertex_areas_bp, tangent_vec_a, tangent_vec_b
-        ):
-            print("tangent_vec_a_i dtype", tangent_vec_a_i.dtype)
-            print("tangent_vec_b_i dtype", tangent_vec_b_i.dtype)
-            print("vertex_areas_bp_i dtype", vertex_areas_bp_i.dtype)
-
-            laplacian_at_base_point = self._space.laplacian(base_point_i)
-
-            einsum_i = gs.sum(
-                gs.einsum(
-                    "...bi,...bi->...b",
-                    laplacian_at_base_point(tangent_vec_a_i),
-                    laplacian_at_base_point(tangent_vec_b_i),
-                )
-                / vertex_areas_bp_i,
-                axis=-1,
-            )
-            einsum.append(einsum_i)
-        einsum = gs.array(einsum)
-
-        inner_prod_a2 = self.a2 * einsum
-
-        # if need_squeeze:
-        #     return gs.squeeze(inner_prod_a2, axis = 0)
-        return inner_prod_a2
+        laplacian_a, laplacian_b = laplacian_at_base_point(
+            gs.stack(gs.broadcast_arrays(tangent_vec_a, tangent_vec_b), axis=0)
+        )
+        return self.a2 * gs.sum(
+            gs.einsum("...bi,...bi->...b", laplacian_a, laplacian_b) / vertex_areas_bp,
+            axis=-1,
+        )
 
     def inner_product(self, tangent_vec_a, tangent_vec_b, base_point):
         r"""Compute inner product between two tangent vectors at a base point.
@@ -880,7 +997,7 @@ class ElasticMetric(RiemannianMetric):
             Tangent vector at base point.
         tangent_vec_b : array-like, shape=[..., n_vertices, 3]
             Tangent vector at base point.
-        base_point : array-like, shape=[n_vertices, 3]
+        base_point : array-like, shape=[..., n_vertices, 3]
             Surface, as the 3D coordinates of the vertices of its triangulation.
 
         Returns
@@ -894,81 +1011,129 @@ class ElasticMetric(RiemannianMetric):
             Sobolev metrics: a comprehensive numerical framework".
             arXiv:2204.04238 [cs.CV], 25 Sep 2022.
         """
-        print("base_point device", base_point.device)
-        print("tangent_vec_a device", tangent_vec_a.device)
-        print("tangent_vec_b device", tangent_vec_b.device)
         to_squeeze = False
-        if tangent_vec_a.ndim == 2 and tangent_vec_b.ndim == 2:
+        if tangent_vec_a.ndim == 2 and tangent_vec_b.ndim == 2 and base_point.ndim == 2:
             to_squeeze = True
+        if self._space.dtype is not None:
+            tangent_vec_a = tangent_vec_a.to(self._space.dtype)
+            tangent_vec_b = tangent_vec_b.to(self._space.dtype)
+            base_point = base_point.to(self._space.dtype)
         if tangent_vec_a.ndim == 2:
             tangent_vec_a = gs.expand_dims(tangent_vec_a, axis=0)
         if tangent_vec_b.ndim == 2:
             tangent_vec_b = gs.expand_dims(tangent_vec_b, axis=0)
 
-        # NOTE: if tangent_vec_a is multiple vectors, then point_a is multiple points.
-        point_a = base_point + tangent_vec_a
-        point_b = base_point + tangent_vec_b
-        # NOTE: might need old version if to_squeeze = true and this version if false.
-        inner_prod = gs.zeros(
-            (gs.maximum(len(tangent_vec_a), len(tangent_vec_b)))
-        )  # CHANGE ALERT: gs.zeros((gs.maximum(len(tangent_vec_a), len(tangent_vec_b)), 1))
-        inner_prod = inner_prod.to(base_point.device)
+        # The active terms are collected and summed once at the end.
+        terms = []
+        # The geometry of the base point is computed once and shared by all the
+        # terms of the inner-product.
+        # The terms that are switched off by a zero coefficient are skipped,
+        # together with the geometry that only they use.
+        one_forms_bp = self._space.surface_one_forms(base_point)
+        normals_bp = self._space._normals_from_one_forms(one_forms_bp)
         if self.a0 > 0 or self.a2 > 0:
-            vertex_areas_bp = self._space.vertex_areas(base_point)
+            triangle_areas_bp = self._space._triangle_areas_from_normals(normals_bp)
+            vertex_areas_bp = self._space._vertex_areas_from_triangle_areas(
+                triangle_areas_bp
+            )
             if self.a0 > 0:
-                inner_prod += self._inner_product_a0(
-                    tangent_vec_a, tangent_vec_b, vertex_areas_bp=vertex_areas_bp
+                terms.append(
+                    self._inner_product_a0(
+                        tangent_vec_a, tangent_vec_b, vertex_areas_bp=vertex_areas_bp
+                    )
                 )
             if self.a2 > 0:
+                laplacian_at_base_point = self._space._laplacian_from_face_geometry(
+                    self._space._sq_len_edges_from_one_forms(one_forms_bp),
+                    triangle_areas_bp,
+                )
                 a_2_term = self._inner_product_a2(
                     tangent_vec_a,
                     tangent_vec_b,
-                    base_point=base_point,
+                    laplacian_at_base_point=laplacian_at_base_point,
                     vertex_areas_bp=vertex_areas_bp,
                 )
-                inner_prod += a_2_term
-        if self.a1 > 0 or self.b1 > 0 or self.c1 > 0 or self.b1 > 0:
-            one_forms_bp = self._space.surface_one_forms(base_point)
-            surface_metrics_bp = self._space._surface_metric_matrices_from_one_forms(
-                one_forms_bp
-            )
-            normals_bp = self._space.normals(base_point)
-            areas_bp = gs.sqrt(gs.linalg.det(surface_metrics_bp))
+                terms.append(a_2_term)
+        if self.a1 > 0 or self.b1 > 0 or self.c1 > 0 or self.d1 > 0:
+            # The volume areas are the square roots of the determinants of the
+            # surface metrics, i.e. twice the norms of the normals. Unlike the
+            # triangle areas, they are not clipped away from zero: a degenerate
+            # face gives inf or nan values in the order one terms.
+            areas_bp = 2 * gs.linalg.norm(normals_bp, axis=-1)
+            # The one forms are linear in the surface, so the variations of
+            # the one forms between the points and the base point are the
+            # one forms of the tangent vectors.
+            one_forms_h = self._space.surface_one_forms(tangent_vec_a)
+            one_forms_k = self._space.surface_one_forms(tangent_vec_b)
 
             if self.c1 > 0:
-                inner_prod += self._inner_product_c1(
-                    point_a, point_b, normals_bp, areas_bp
+                # Compute the normals of the points a and b in a single batch,
+                # from their one forms.
+                normals_a, normals_b = self._space._normals_from_one_forms(
+                    one_forms_bp
+                    + gs.stack(gs.broadcast_arrays(one_forms_h, one_forms_k), axis=0)
+                )
+                terms.append(
+                    self._inner_product_c1(normals_a, normals_b, normals_bp, areas_bp)
                 )
             if self.d1 > 0 or self.b1 > 0 or self.a1 > 0:
-                ginv_bp = gs.linalg.inv(surface_metrics_bp)
-                one_forms_a = self._space.surface_one_forms(point_a)
-                one_forms_b = self._space.surface_one_forms(point_b)
+                one_forms_bp_t = gs.moveaxis(one_forms_bp, -1, -2)
+                if self.face_dtype is not None:
+                    # The per-face products are computed in reduced precision,
+                    # the multiplication by the areas promotes them back.
+                    one_forms_h = one_forms_h.to(self.face_dtype)
+                    one_forms_k = one_forms_k.to(self.face_dtype)
+                    one_forms_bp_t = one_forms_bp_t.to(self.face_dtype)
+                # Products shared by the d1 term and the variations of the
+                # surface metric of the a1 and b1 terms.
+                cross_a = gs.matmul(one_forms_h, one_forms_bp_t)
+                cross_b = gs.matmul(one_forms_k, one_forms_bp_t)
                 if self.d1 > 0:
-                    inner_prod += self._inner_product_d1(
-                        one_forms_a,
-                        one_forms_b,
-                        one_forms_bp,
-                        areas_bp=areas_bp,
-                        inv_surface_metrics_bp=ginv_bp,
+                    terms.append(
+                        self._inner_product_d1(
+                            cross_a,
+                            cross_b,
+                            areas_bp=areas_bp,
+                        )
                     )
 
                 if self.b1 > 0 or self.a1 > 0:
+                    # The inverse surface metrics are only needed by a1 and b1:
+                    # the d1 term reduces to the areas of the faces.
+                    ginv_bp = _inv_2x2(
+                        self._space._surface_metric_matrices_from_one_forms(
+                            one_forms_bp
+                        )
+                    )
+                    if self.face_dtype is not None:
+                        ginv_bp = ginv_bp.to(self.face_dtype)
                     dga = (
-                        gs.matmul(
-                            one_forms_a, gs.transpose(one_forms_a, axes=(0, 1, 3, 2))
+                        cross_a
+                        + gs.moveaxis(cross_a, -1, -2)
+                        + self._space._surface_metric_matrices_from_one_forms(
+                            one_forms_h
                         )
-                        - surface_metrics_bp
                     )
                     dgb = (
-                        gs.matmul(
-                            one_forms_b, gs.transpose(one_forms_b, axes=(0, 1, 3, 2))
+                        cross_b
+                        + gs.moveaxis(cross_b, -1, -2)
+                        + self._space._surface_metric_matrices_from_one_forms(
+                            one_forms_k
                         )
-                        - surface_metrics_bp
                     )
                     ginvdga = gs.matmul(ginv_bp, dga)
                     ginvdgb = gs.matmul(ginv_bp, dgb)
-                    inner_prod += self._inner_product_a1(ginvdga, ginvdgb, areas_bp)
-                    inner_prod += self._inner_product_b1(ginvdga, ginvdgb, areas_bp)
+                    terms.append(self._inner_product_a1_b1(ginvdga, ginvdgb, areas_bp))
+        if not terms:
+            batch_shape = torch.broadcast_shapes(
+                tangent_vec_a.shape[:-2],
+                tangent_vec_b.shape[:-2],
+                base_point.shape[:-2],
+            )
+            terms.append(
+                gs.zeros(batch_shape, dtype=base_point.dtype, device=base_point.device)
+            )
+        inner_prod = sum(terms[1:], terms[0])
         return gs.squeeze(inner_prod, axis=0) if to_squeeze else inner_prod
 
     def path_energy_per_time(self, path):
@@ -989,17 +1154,18 @@ class ElasticMetric(RiemannianMetric):
             path = gs.expand_dims(path, axis=0)
             need_squeeze = True
         n_times = path.shape[-3]
-        surface_diffs = path[:, 1:, :, :] - path[:, :-1, :, :]
-        surface_midpoints = path[:, : n_times - 1, :, :] + surface_diffs / 2
-        energy_per_path = []
-        for one_surface_diffs, one_surface_midpoints in zip(
-            surface_diffs, surface_midpoints
-        ):
-            energy = []
-            for diff, midpoint in zip(one_surface_diffs, one_surface_midpoints):
-                energy.extend([n_times * self.squared_norm(diff, midpoint)])
-            energy_per_path.append(gs.array(energy))
-        energy_per_path = gs.array(energy_per_path)
+        left, right = path[:, :-1, :, :], path[:, 1:, :, :]
+        surface_diffs = right - left
+        # The midpoints are computed in a single kernel, without allocating
+        # the halved differences.
+        surface_midpoints = left.add(surface_diffs, alpha=0.5)
+        # All the steps of all the paths are evaluated in a single batch of
+        # tangent vectors at their own base points.
+        energy_per_path = n_times * self.squared_norm(
+            gs.reshape(surface_diffs, (-1,) + surface_diffs.shape[-2:]),
+            gs.reshape(surface_midpoints, (-1,) + surface_midpoints.shape[-2:]),
+        )
+        energy_per_path = gs.reshape(energy_per_path, surface_diffs.shape[:-2])
         return gs.squeeze(energy_per_path, axis=0) if need_squeeze else energy_per_path
 
     def path_energy(self, path):
@@ -1033,7 +1199,10 @@ class ElasticMetric(RiemannianMetric):
             End point of the geodesic starting at base_point with
             initial velocity tangent_vec and stopping at time 1.
         """
-        return self.exp_solver.exp(self._space, tangent_vec, base_point)
+        dtype, device = base_point.dtype, base_point.device
+        tangent_vec, base_point = self._to_space(tangent_vec, base_point)
+        exp = self.exp_solver.exp(self._space, tangent_vec, base_point)
+        return exp.to(dtype=dtype, device=device)
 
     def log(self, point, base_point):
         """Compute the logarithm map.
@@ -1051,7 +1220,133 @@ class ElasticMetric(RiemannianMetric):
             Initial velocity of the geodesic starting at base_point and
             reaching point at time 1.
         """
-        return self.log_solver.log(self._space, point, base_point)
+        dtype, device = base_point.dtype, base_point.device
+        point, base_point = self._to_space(point, base_point)
+        log = self.log_solver.log(self._space, point, base_point)
+        return log.to(dtype=dtype, device=device)
+
+    def _to_space(self, *arrays):
+        """Move surfaces to the device and dtype of the space.
+
+        The geodesic solvers then iterate on the device of the faces and in
+        the dtype of the inner-products, so that the surfaces are not cast
+        again at each evaluation of the path energy.
+
+        Parameters
+        ----------
+        arrays : array-like, shape=[..., n_vertices, 3]
+            Surfaces or tangent vectors.
+
+        Returns
+        -------
+        arrays : tuple of array-like, shape=[..., n_vertices, 3]
+            Surfaces or tangent vectors, on the device of the space and in
+            its dtype, if any.
+        """
+        dtype = self._space.dtype
+        return tuple(
+            array.to(device=self._space.device, dtype=dtype or array.dtype)
+            for array in arrays
+        )
+
+
+class TorchLBFGS:
+    """L-BFGS optimizer that keeps the iterates on the device of the guess.
+
+    Wraps torch.optim.LBFGS behind the same `minimize` interface as the SciPy
+    optimizers, so that the objective and its gradient are evaluated without
+    converting the iterates to numpy.
+
+    Parameters
+    ----------
+    max_iter : int
+        Maximal number of iterations.
+        Optional, default: 100.
+    max_eval : int
+        Maximal number of evaluations of the objective.
+        Optional, default: None, i.e. 1.25 times max_iter.
+    tolerance_grad : float
+        Termination tolerance on the first order optimality.
+        Optional, default: 1e-7.
+    tolerance_change : float
+        Termination tolerance on the changes of the objective and iterates.
+        Optional, default: 1e-9.
+    history_size : int
+        Update history size.
+        Optional, default: 100.
+    line_search_fn : str
+        Line search method, either "strong_wolfe" or None.
+        Optional, default: "strong_wolfe".
+    """
+
+    def __init__(
+        self,
+        max_iter=100,
+        max_eval=None,
+        tolerance_grad=1e-7,
+        tolerance_change=1e-9,
+        history_size=100,
+        line_search_fn="strong_wolfe",
+    ):
+        self.max_iter = max_iter
+        self.max_eval = max_eval
+        self.tolerance_grad = tolerance_grad
+        self.tolerance_change = tolerance_change
+        self.history_size = history_size
+        self.line_search_fn = line_search_fn
+
+    def minimize(self, fun, x0):
+        """Minimize objective function.
+
+        Parameters
+        ----------
+        fun : callable
+            The objective function to be minimized.
+        x0 : array-like
+            Initial guess.
+
+        Returns
+        -------
+        res : OptimizeResult
+            Result of the minimization, with the solution as attribute x.
+        """
+        param = gs.copy(x0).detach().requires_grad_(True)
+        optimizer = torch.optim.LBFGS(
+            [param],
+            max_iter=self.max_iter,
+            max_eval=self.max_eval,
+            tolerance_grad=self.tolerance_grad,
+            tolerance_change=self.tolerance_change,
+            history_size=self.history_size,
+            line_search_fn=self.line_search_fn,
+        )
+
+        # The last evaluated iterate is copied into a buffer allocated once,
+        # rather than cloned at every evaluation.
+        last_x = gs.copy(param.detach())
+        last_evaluation = {}
+
+        def closure():
+            optimizer.zero_grad()
+            loss = fun(param)
+            loss.backward()
+            last_x.copy_(param.detach())
+            last_evaluation["fun"] = loss.detach()
+            return loss
+
+        optimizer.step(closure)
+
+        # When the initial guess already satisfies the first order condition,
+        # e.g. a straight path that is already a geodesic, the optimizer stops
+        # after its first evaluation, which is then reused.
+        x = param.detach()
+        if torch.equal(last_x, x):
+            value = last_evaluation["fun"]
+        else:
+            value = fun(param).detach()
+        return OptimizeResult(
+            fun=value, x=x, nit=optimizer.state[param].get("n_iter", 0)
+        )
 
 
 class _ExpSolver:
@@ -1059,10 +1354,11 @@ class _ExpSolver:
 
     def __init__(self, n_steps=10, optimizer=None):
         if optimizer is None:
-            optimizer = ScipyMinimize(
-                method="L-BFGS-B",
-                jac="autodiff",
-                options={"disp": False, "ftol": 0.00001},
+            # The iteration budget is the one of SciPy's L-BFGS-B. The torch
+            # tolerance on changes is absolute and also stops on small steps,
+            # hence tighter than the relative ftol=1e-5 it replaces.
+            optimizer = TorchLBFGS(
+                max_iter=15000, tolerance_grad=1e-5, tolerance_change=1e-7
             )
 
         self.n_steps = n_steps
@@ -1088,7 +1384,6 @@ class _ExpSolver:
         exp : array-like, shape=[n_vertices, 3]
             Point on the manifold.
         """
-        exps = []
         need_squeeze = False
         if tangent_vec.ndim == 2:
             tangent_vec = gs.expand_dims(tangent_vec, axis=0)
@@ -1102,11 +1397,15 @@ class _ExpSolver:
         if len(base_point) != n_exps:
             base_point = gs.tile(base_point, (n_exps, 1, 1))
 
-        for one_tangent_vec, one_base_point in zip(tangent_vec, base_point):
-            geod = self._ivp(space, one_base_point, one_tangent_vec)
-            exps.append(geod[-1])
-
-        exps = gs.array(exps)
+        # Each geodesic is shot with its own L-BFGS solves, so that it converges
+        # on its own gradient norm, whatever the other vectors of the batch.
+        exps = gs.stack(
+            [
+                self._ivp(space, one_base_point, one_tangent_vec)[-1]
+                for one_tangent_vec, one_base_point in zip(tangent_vec, base_point)
+            ],
+            axis=0,
+        )
         if need_squeeze:
             exps = gs.squeeze(exps, axis=0)
         return exps
@@ -1122,12 +1421,10 @@ class _ExpSolver:
             Initial point, i.e. initial discrete surface.
         initial_tangent_vec : array-like, shape=[n_vertices, 3]
             Initial tangent vector.
-        times : array-like, shape=[n_times,]
-            Times between 0 and 1.
 
         Returns
         -------
-        geod : array-like, shape=[n_times, n_vertices, 3]
+        geod : array-like, shape=[n_steps, n_vertices, 3]
             Geodesic discretized along the times given as inputs.
         """
         initial_tangent_vec = initial_tangent_vec / (self.n_steps - 1)
@@ -1159,66 +1456,77 @@ class _ExpSolver:
         next_point = gs.array(next_point)
         n_vertices = current_point.shape[-2]
 
-        zeros = gs.zeros_like(current_point)
-        next_point_clone = gs.copy(next_point)
+        zeros = gs.zeros_like(current_point).requires_grad_(True)
+        next_point_clone = gs.copy(next_point).detach().requires_grad_(True)
+
+        def _grad(func, *points):
+            """Compute the gradients of func at points, as differentiable tensors.
+
+            The graph of the gradients is kept so that the energy objective
+            can itself be differentiated with respect to the next next point.
+            """
+            return torch.autograd.grad(func(*points), points, create_graph=True)
+
+        current_to_next = next_point - current_point
+
+        def _inner_product_with_current_to_next(tangent_vec):
+            """Compute inner-product with tangent vector `current_to_next`.
+
+            The tangent vector `current_to_next` is the vector going from the
+            current point, i.e. discrete surface, to the next point on the
+            geodesic that is being computed.
+            """
+            return space.metric.inner_product(
+                current_to_next, tangent_vec, current_point
+            )
+
+        # The term of the current point does not depend on the next next point,
+        # so it is computed once rather than at every evaluation of the
+        # objective, where the geometry of the current point would be rebuilt.
+        (energy_1,) = _grad(_inner_product_with_current_to_next, zeros)
+        energy_1 = energy_1.detach()
 
         def energy_objective(next_next_point):
             """Compute the energy objective to minimize.
 
             Parameters
             ----------
-            next_next_point : array-like, shape=[n_vertices, 3]
-                Next next point on the geodesic.
+            next_next_point : array-like, shape=[n_vertices * 3]
+                Next next point on the geodesic, flattened.
 
             Returns
             -------
             energy_tot : array-like, shape=[,]
                 Energy objective to minimize.
             """
-            next_next_point = gs.reshape(gs.array(next_next_point), (n_vertices, 3))
-            current_to_next = next_point - current_point
+            next_next_point = gs.reshape(
+                gs.array(next_next_point).to(next_point.device), (n_vertices, 3)
+            )
             next_to_next_next = next_next_point - next_point
 
-            def _inner_product_with_current_to_next(tangent_vec):
-                """Compute inner-product with tangent vector `current_to_next`.
-
-                The tangent vector `current_to_next` is the vector going from the
-                current point, i.e. discrete surface, to the next point on the
-                geodesic that is being computed.
-                """
-                return space.metric.inner_product(
-                    current_to_next, tangent_vec, current_point
-                )
-
-            def _inner_product_with_next_to_next_next(tangent_vec):
-                """Compute inner-product with tangent vector `next_to_next_next`.
+            def _energy_at_next_point(tangent_vec, base_point):
+                """Compute the terms of the energy at the next point.
 
                 The tangent vector `next_to_next_next` is the vector going from the
                 next point, i.e. discrete surface, to the next next point on the
-                geodesic that is being computed.
+                geodesic that is being computed. Its inner-product with
+                tangent_vec is taken at the next point itself, whose geometry
+                is not differentiated, and its squared norm at base_point, a
+                copy of the next point that is differentiated. Both are
+                evaluated in a single batched call to the inner-product.
                 """
-                return space.metric.inner_product(
-                    next_to_next_next, tangent_vec, next_point
+                inner_prods = space.metric.inner_product(
+                    gs.stack([next_to_next_next, next_to_next_next]),
+                    gs.stack([tangent_vec, next_to_next_next]),
+                    gs.stack([next_point, base_point]),
                 )
+                return -2 * inner_prods[0] + inner_prods[1]
 
-            def _norm(base_point):
-                """Compute norm of `next_to_next_next` at the base_point.
-
-                The tangent vector `next_to_next_next` is the vector going from the
-                next point, i.e. discrete surface, to the next next point on the
-                geodesic that is being computed.
-                """
-                return space.metric.squared_norm(next_to_next_next, base_point)
-
-            _, energy_1 = gs.autodiff.value_and_grad(
-                _inner_product_with_current_to_next
-            )(zeros)
-            _, energy_2 = gs.autodiff.value_and_grad(
-                _inner_product_with_next_to_next_next
-            )(zeros)
-            _, energy_3 = gs.autodiff.value_and_grad(_norm)(next_point_clone)
+            # The terms at the next point are differentiated with respect to the
+            # tangent vector and to the base point in a single backward pass.
+            energy_2, energy_3 = _grad(_energy_at_next_point, zeros, next_point_clone)
 
-            energy_tot = 2 * energy_1 - 2 * energy_2 + energy_3
+            energy_tot = 2 * energy_1 + energy_2 + energy_3
             return gs.sum(energy_tot**2)
 
         initial_next_next_point = gs.flatten(
@@ -1230,7 +1538,7 @@ class _ExpSolver:
             initial_next_next_point,
         )
 
-        return gs.reshape(gs.array(sol.x), (n_vertices, 3))
+        return gs.reshape(gs.array(sol.x).to(next_point.device), (n_vertices, 3))
 
 
 class _LogSolver:
@@ -1238,10 +1546,8 @@ class _LogSolver:
 
     def __init__(self, n_steps=10, optimizer=None):
         if optimizer is None:
-            optimizer = ScipyMinimize(
-                method="L-BFGS-B",
-                jac="autodiff",
-                options={"disp": False, "ftol": 0.001},
+            optimizer = TorchLBFGS(
+                max_iter=15000, tolerance_grad=1e-5, tolerance_change=1e-7
             )
 
         self.n_steps = n_steps
@@ -1265,7 +1571,6 @@ class _LogSolver:
         tangent_vec : array-like, shape=[..., n_vertices, 3]
             Tangent vector at the base point.
         """
-        logs = []
         need_squeeze = False
         if point.ndim == 2:
             point = gs.expand_dims(point, axis=0)
@@ -1280,11 +1585,13 @@ class _LogSolver:
         if len(base_point) != n_logs:
             base_point = gs.tile(base_point, (n_logs, 1, 1))
 
+        # Each path is straightened with its own L-BFGS solve, so that it
+        # converges on its own gradient norm, whatever the other pairs.
+        logs = []
         for one_point, one_base_point in zip(point, base_point):
             geod = self._bvp(space, one_base_point, one_point)
             logs.append(geod[1] - geod[0])
-
-        logs = gs.array(logs)
+        logs = gs.stack(logs, axis=0)
         if need_squeeze:
             logs = gs.squeeze(logs, axis=0)
         return logs
@@ -1296,40 +1603,34 @@ class _LogSolver:
 
         Parameters
         ----------
-        initial_point : array-like, shape=[n_vertices, 3]
+        initial_point : array-like, shape=[..., n_vertices, 3]
             Initial point, i.e. initial discrete surface.
-        end_point : array-like, shape=[n_vertices, 3]
+        end_point : array-like, shape=[..., n_vertices, 3]
             End point, i.e. end discrete surface.
-        times : array-like, shape=[n_times,]
-            Times between 0 and 1.
 
         Returns
         -------
-        geod : array-like, shape=[n_times, n_vertices, 3]
+        geod : array-like, shape=[..., n_steps, n_vertices, 3]
             Geodesic discretized on the times given as inputs.
         """
-        times = gs.linspace(0.0, 1.0, self.n_steps)
+        all_need_squeeze = initial_point.ndim == 2 and end_point.ndim == 2
         n_points = initial_point.shape[-2]
-        step = (end_point - initial_point) / (self.n_steps - 1)
-        geod = gs.array([initial_point + i * step for i in times])
-        midpoints = geod[1 : self.n_steps - 1]
-
-        all_need_squeeze = False
-        if midpoints.ndim == 3:
-            all_need_squeeze = True
-            initial_point = gs.expand_dims(initial_point, axis=0)
-            end_point = gs.expand_dims(end_point, axis=0)
-            midpoints = gs.expand_dims(midpoints, axis=0)
-            num_points = midpoints.shape[0]
-        else:
-            if initial_point.ndim == 2:
-                initial_point = gs.expand_dims(initial_point, axis=0)
-                num_points = end_point.shape[0]
-            if end_point.ndim == 2:
-                end_point = gs.expand_dims(end_point, axis=0)
-                num_points = initial_point.shape[0]
-            midpoints = gs.reshape(
-                midpoints, (num_points, self.n_times - 2, n_points, 3)
+        initial_point, end_point = gs.broadcast_arrays(
+            gs.reshape(initial_point, (-1, n_points, 3)),
+            gs.reshape(end_point, (-1, n_points, 3)),
+        )
+        num_points = len(initial_point)
+
+        times = gs.linspace(0.0, 1.0, self.n_steps).to(initial_point)
+        geod = initial_point + gs.reshape(times, (-1, 1, 1, 1)) * (
+            end_point - initial_point
+        )
+        midpoints = gs.moveaxis(geod[1 : self.n_steps - 1], 0, 1)
+
+        def _paths_from_midpoints(midpoints):
+            """Join the midpoints of each path to its initial and end points."""
+            return gs.concatenate(
+                [initial_point[:, None], midpoints, end_point[:, None]], axis=1
             )
 
         def objective(midpoint):
@@ -1346,23 +1647,11 @@ class _LogSolver:
                 Energy of the path going through this midpoint.
             """
             midpoint = gs.reshape(
-                gs.array(midpoint), (num_points, self.n_steps - 2, n_points, 3)
+                gs.array(midpoint).to(initial_point.device),
+                (num_points, self.n_steps - 2, n_points, 3),
             )
 
-            paths = []
-            for one_midpoint, one_initial_point, one_end_point in zip(
-                midpoint, initial_point, end_point
-            ):
-                one_path = gs.concatenate(
-                    [
-                        one_initial_point[None, :, :],
-                        one_midpoint,
-                        one_end_point[None, :, :],
-                    ],
-                    axis=0,
-                )
-                paths.append(one_path)
-            paths = gs.array(paths)
+            paths = _paths_from_midpoints(midpoint)
             return space.metric.path_energy(paths)
 
         initial_geod = gs.flatten(midpoints)
@@ -1372,18 +1661,12 @@ class _LogSolver:
             initial_geod,
         )
 
-        out = gs.reshape(gs.array(sol.x), (num_points, self.n_steps - 2, n_points, 3))
+        out = gs.reshape(
+            gs.array(sol.x).to(initial_point.device),
+            (num_points, self.n_steps - 2, n_points, 3),
+        )
 
-        geod = []
-        for one_out, one_initial_point, one_end_point in zip(
-            out, initial_point, end_point
-        ):
-            one_geod = gs.concatenate(
-                [one_initial_point[None, :, :], one_out, one_end_point[None, :, :]],
-                axis=0,
-            )
-            geod.append(one_geod)
-        geod = gs.array(geod)
+        geod = _paths_from_midpoints(out)
         if all_need_squeeze:
             geod = gs.squeeze(geod, axis=0)
 
@@ -0,0 +1,409 @@
+"""Unit tests for the discrete surfaces with elastic metrics."""
+
+import math
+import os
+
+os.environ["GEOMSTATS_BACKEND"] = "pytorch"  # noqa: E402
+import geomstats.backend as gs
+import torch
+
+from src.regression.discrete_surfaces import (
+    DiscreteSurfaces,
+    ElasticMetric,
+    TorchLBFGS,
+    _det_2x2,
+    _inv_2x2,
+    _SparseMatVec,
+)
+
+TETRAHEDRON_VERTICES = gs.array(
+    [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+)
+TETRAHEDRON_FACES = gs.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]])
+
+
+def test_triangle_areas():
+    """Test that the triangle areas of a tetrahedron are correct.
+
+    Three faces are right triangles of area 1/2, and the last face is an
+    equilateral triangle of side sqrt(2).
+    """
+    space = DiscreteSurfaces(faces=TETRAHEDRON_FACES)
+    areas = space._triangle_areas(TETRAHEDRON_VERTICES)
+    expected = gs.array([0.5, 0.5, 0.5, math.sqrt(3.0) / 2])
+
+    assert gs.all(gs.isclose(areas, expected))
+
+
+def test_vertex_areas():
+    """Test that each vertex gathers the areas of its own incident faces.
+
+    The vertex 0 is incident to the three right triangles, while the other
+    vertices are incident to two right triangles and the equilateral one.
+    """
+    space = DiscreteSurfaces(faces=TETRAHEDRON_FACES)
+    vertex_areas = space.vertex_areas(TETRAHEDRON_VERTICES)
+    incident_areas = 1.0 + math.sqrt(3.0) / 2
+    expected = 2 * gs.array([1.5, incident_areas, incident_areas, incident_areas]) / 3.0
+
+    assert gs.all(gs.isclose(vertex_areas, expected))
+
+
+def test_face_areas():
+    """Test that the face areas are the volume areas of the surface metric.
+
+    The volume area is the square root of the determinant of the surface
+    metric matrices, that are 2x2 matrices at each face.
+    """
+    space = DiscreteSurfaces(faces=TETRAHEDRON_FACES)
+    face_areas = space.face_areas(TETRAHEDRON_VERTICES)
+    surface_metrics = space.surface_metric_matrices(TETRAHEDRON_VERTICES)
+    expected = gs.sqrt(gs.linalg.det(surface_metrics))
+
+    assert gs.all(gs.isclose(face_areas, expected))
+
+
+def test_det_and_inv_2x2():
+    """Test that the closed-form 2x2 determinant and inverse match linalg.
+
+    The matrices are the surface metric matrices of the tetrahedron.
+    """
+    space = DiscreteSurfaces(faces=TETRAHEDRON_FACES)
+    surface_metrics = space.surface_metric_matrices(TETRAHEDRON_VERTICES)
+
+    assert gs.all(gs.isclose(_det_2x2(surface_metrics), gs.linalg.det(surface_metrics)))
+    assert gs.all(gs.isclose(_inv_2x2(surface_metrics), gs.linalg.inv(surface_metrics)))
+
+
+def test_laplacian_of_constant_field():
+    """Test that the mesh Laplacian vanishes on a constant vector field.
+
+    This is checked for a single base point and for a batch of base points,
+    where the Laplacian is assembled as a block-diagonal matrix.
+    """
+    space = DiscreteSurfaces(faces=TETRAHEDRON_FACES)
+    constant_field = gs.ones((4, 3))
+    base_points = gs.stack([TETRAHEDRON_VERTICES, 2.0 * TETRAHEDRON_VERTICES])
+
+    laplacian = space.laplacian(TETRAHEDRON_VERTICES)
+    assert gs.all(gs.isclose(laplacian(constant_field), gs.zeros((4, 3))))
+
+    laplacian = space.laplacian(base_points)
+    assert gs.all(gs.isclose(laplacian(constant_field), gs.zeros((2, 4, 3))))
+
+
+def test_laplacian_and_inner_product_with_two_batch_axes():
+    """Test the Laplacian and the a2 term on base points with two batch axes.
+
+    The results must match the ones computed at each base point separately.
+    """
+    space = DiscreteSurfaces(faces=TETRAHEDRON_FACES)
+    metric = space.metric
+    scales = gs.reshape(gs.arange(1.0, 7.0), (2, 3, 1, 1))
+    base_points = scales * TETRAHEDRON_VERTICES
+    tangent_vecs = gs.reshape(gs.arange(72.0), (2, 3, 4, 3)) / 72.0
+
+    laplacians = space.laplacian(base_points)(tangent_vecs)
+    inner_prods = metric.inner_product(tangent_vecs, tangent_vecs, base_points)
+    for i in range(2):
+        for j in range(3):
+            laplacian = space.laplacian(base_points[i, j])(tangent_vecs[i, j])
+            inner_prod = metric.inner_product(
+                tangent_vecs[i, j], tangent_vecs[i, j], base_points[i, j]
+            )
+            assert gs.all(gs.isclose(laplacians[i, j], laplacian))
+            assert gs.isclose(inner_prods[i, j], inner_prod)
+
+
+def _reference_inner_product_term(space, term, tangent_vec_a, tangent_vec_b, point):
+    """Compute one term of the inner-product with its original matrix formulas.
+
+    The surfaces and tangent vectors are unbatched. The first order terms are
+    computed from the one forms of the points q + h and q + k, as in
+    [HSKCB2022], rather than from the one forms of h and k.
+    """
+    point_a = point + tangent_vec_a
+    point_b = point + tangent_vec_b
+    if term == "a0":
+        return gs.sum(
+            space.vertex_areas(point) * gs.sum(tangent_vec_a * tangent_vec_b, axis=-1)
+        )
+    if term == "a2":
+        laplacian = space.laplacian(point)
+        return gs.sum(
+            gs.sum(laplacian(tangent_vec_a) * laplacian(tangent_vec_b), axis=-1)
+            / space.vertex_areas(point)
+        )
+
+    surface_metrics = space.surface_metric_matrices(point)
+    ginv = gs.linalg.inv(surface_metrics)
+    areas = gs.sqrt(gs.linalg.det(surface_metrics))
+    if term == "c1":
+        dna = space.normals(point_a) - space.normals(point)
+        dnb = space.normals(point_b) - space.normals(point)
+        return gs.sum(gs.sum(dna * dnb, axis=-1) * areas)
+
+    one_forms = space.surface_one_forms(point)
+    one_forms_t = gs.transpose(one_forms, (0, 2, 1))
+    one_forms_a = space.surface_one_forms(point_a)
+    one_forms_b = space.surface_one_forms(point_b)
+    if term == "d1":
+        xa = gs.transpose(one_forms_a, (0, 2, 1)) - one_forms_t
+        xb = gs.transpose(one_forms_b, (0, 2, 1)) - one_forms_t
+        xa_0 = gs.matmul(
+            gs.matmul(one_forms_t, ginv),
+            gs.matmul(gs.transpose(xa, (0, 2, 1)), one_forms_t)
+            - gs.matmul(one_forms, xa),
+        )
+        xb_0 = gs.matmul(
+            gs.matmul(one_forms_t, ginv),
+            gs.matmul(gs.transpose(xb, (0, 2, 1)), one_forms_t)
+            - gs.matmul(one_forms, xb),
+        )
+        products = gs.matmul(xa_0, gs.matmul(ginv, gs.transpose(xb_0, (0, 2, 1))))
+        return gs.sum(gs.einsum("bii->b", products) * areas)
+
+    dga = gs.matmul(one_forms_a, gs.transpose(one_forms_a, (0, 2, 1))) - surface_metrics
+    dgb = gs.matmul(one_forms_b, gs.transpose(one_forms_b, (0, 2, 1))) - surface_metrics
+    ginvdga = gs.matmul(ginv, dga)
+    ginvdgb = gs.matmul(ginv, dgb)
+    if term == "a1":
+        traces = gs.einsum("bii->b", gs.matmul(ginvdga, ginvdgb))
+    else:
+        traces = gs.einsum("bii->b", ginvdga) * gs.einsum("bii->b", ginvdgb)
+    return gs.sum(traces * areas)
+
+
+def test_inner_product_terms_match_matrix_formulas():
+    """Test each term of the inner-product against its original formulas.
+
+    The terms are computed with closed forms, e.g. the d1 term from the
+    antisymmetric parts of the products of the one forms. They are compared
+    for unbatched inputs, and for batches of tangent vectors and base points.
+    """
+    space = DiscreteSurfaces(faces=TETRAHEDRON_FACES)
+    base_points = gs.stack(
+        [TETRAHEDRON_VERTICES, TETRAHEDRON_VERTICES + 0.1 * TETRAHEDRON_VERTICES**2]
+    )
+    tangent_vecs_a = gs.reshape(gs.sin(gs.arange(24.0)), (2, 4, 3)) / 4.0
+    tangent_vecs_b = gs.reshape(gs.cos(gs.arange(24.0)), (2, 4, 3)) / 4.0
+
+    terms = ["a0", "a1", "b1", "c1", "d1", "a2"]
+    for term in terms:
+        coefficients = {name: float(name == term) for name in terms}
+        metric = ElasticMetric(space, **coefficients)
+        expected = gs.stack(
+            [
+                _reference_inner_product_term(
+                    space, term, tangent_vecs_a[i], tangent_vecs_b[i], base_points[i]
+                )
+                for i in range(2)
+            ]
+        )
+
+        inner_prod = metric.inner_product(
+            tangent_vecs_a[0], tangent_vecs_b[0], base_points[0]
+        )
+        assert gs.isclose(inner_prod, expected[0])
+        inner_prods = metric.inner_product(tangent_vecs_a, tangent_vecs_b, base_points)
+        assert gs.all(gs.isclose(inner_prods, expected))
+
+
+def test_sparse_mat_vec_gradients():
+    """Test the hand-written backward of the sparse matrix-vector product.
+
+    The gradients, and the gradients of the gradients used by the exp solver,
+    are checked against finite differences with respect to the weights of
+    the Laplacian of the tetrahedron and to a batch of vector fields.
+    """
+    space = DiscreteSurfaces(faces=TETRAHEDRON_FACES)
+    rows, cols = space._laplacian_rows, space._laplacian_cols
+    weights = gs.linspace(-1.0, 1.0, len(rows)).requires_grad_(True)
+    vec = gs.reshape(gs.sin(gs.arange(24.0)), (4, 6)).requires_grad_(True)
+
+    def sparse_mat_vec(weights, vec):
+        return _SparseMatVec.apply(weights, rows, cols, vec)
+
+    assert torch.autograd.gradcheck(sparse_mat_vec, (weights, vec))
+    assert torch.autograd.gradgradcheck(sparse_mat_vec, (weights, vec))
+
+
+def test_inner_product_face_dtype():
+    """Test the first order terms computed in reduced precision per face.
+
+    The a1, b1 and d1 terms computed in bfloat16 and float16 stay within a
+    relative tolerance of 2e-2 and 5e-3 respectively of their values in full
+    precision, i.e. a few machine epsilons of the face dtype. They are still
+    returned in the dtype of the base point.
+    """
+    space = DiscreteSurfaces(faces=TETRAHEDRON_FACES)
+    tangent_vecs_a = gs.reshape(gs.sin(gs.arange(24.0)), (2, 4, 3)) / 4.0
+    tangent_vecs_b = gs.reshape(gs.cos(gs.arange(24.0)), (2, 4, 3)) / 4.0
+
+    terms = ["a0", "a1", "b1", "c1", "d1", "a2"]
+    for term in ["a1", "b1", "d1"]:
+        coefficients = {name: float(name == term) for name in terms}
+        expected = ElasticMetric(space, **coefficients).inner_product(
+            tangent_vecs_a, tangent_vecs_b, TETRAHEDRON_VERTICES
+        )
+        for face_dtype, rtol in [(torch.bfloat16, 2e-2), (torch.float16, 5e-3)]:
+            metric = ElasticMetric(space, face_dtype=face_dtype, **coefficients)
+            inner_prods = metric.inner_product(
+                tangent_vecs_a, tangent_vecs_b, TETRAHEDRON_VERTICES
+            )
+            assert inner_prods.dtype == TETRAHEDRON_VERTICES.dtype
+            assert gs.all(gs.isclose(inner_prods, expected, rtol=rtol, atol=0.0))
+
+
+def test_space_dtype():
+    """Test that a space with a dtype computes in it and returns in the input dtype.
+
+    The inner-product of float64 inputs is computed in float32, while exp and
+    log, which solve in float32, return their results in float64.
+    """
+    space = DiscreteSurfaces(faces=TETRAHEDRON_FACES, dtype=torch.float32)
+    space.metric.exp_solver.n_steps = 3
+    space.metric.log_solver.n_steps = 3
+    base_point = gs.array(TETRAHEDRON_VERTICES, dtype=torch.float64)
+    tangent_vec = gs.reshape(gs.sin(gs.arange(12.0)), (4, 3)) / 10.0
+
+    inner_prod = space.metric.inner_product(tangent_vec, tangent_vec, base_point)
+    assert inner_prod.dtype == torch.float32
+
+    exp = space.metric.exp(tangent_vec, base_point)
+    log = space.metric.log(exp, base_point)
+    assert exp.dtype == torch.float64
+    assert log.dtype == torch.float64
+
+
+def test_torch_lbfgs_minimize():
+    """Test that the torch L-BFGS optimizer finds the minimum of a quadratic."""
+    target = gs.array([1.0, -2.0, 3.0])
+
+    def fun(x):
+        return gs.sum((x - target) ** 2)
+
+    res = TorchLBFGS().minimize(fun, gs.zeros(3))
+
+    assert gs.all(gs.isclose(res.x, target))
+    assert gs.isclose(res.fun, gs.array(0.0))
+
+
+def test_exp_batched_matches_exp_per_vector():
+    """Test that the exp of a batch of tangent vectors matches each exp.
+
+    Each geodesic of the batch must converge on its own, whatever the other
+    tangent vectors that are shot with it.
+    """
+    space = DiscreteSurfaces(faces=TETRAHEDRON_FACES)
+    space.metric.exp_solver.n_steps = 4
+    tangent_vecs = 0.1 * gs.array(
+        [
+            [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 1.0]],
+            [[0.0, 0.0, -1.0], [0.0, 1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 0.0]],
+        ]
+    )
+
+    exps = space.metric.exp(tangent_vecs, TETRAHEDRON_VERTICES)
+    expected = gs.stack(
+        [
+            space.metric.exp(tangent_vec, TETRAHEDRON_VERTICES)
+            for tangent_vec in tangent_vecs
+        ]
+    )
+
+    assert gs.all(gs.isclose(exps, expected, atol=1e-6))
+
+
+def _icosphere():
+    """Compute the vertices and faces of a once subdivided icosahedron."""
+    golden = (1.0 + math.sqrt(5.0)) / 2
+    vertices = [
+        [-1.0, golden, 0.0],
+        [1.0, golden, 0.0],
+        [-1.0, -golden, 0.0],
+        [1.0, -golden, 0.0],
+        [0.0, -1.0, golden],
+        [0.0, 1.0, golden],
+        [0.0, -1.0, -golden],
+        [0.0, 1.0, -golden],
+        [golden, 0.0, -1.0],
+        [golden, 0.0, 1.0],
+        [-golden, 0.0, -1.0],
+        [-golden, 0.0, 1.0],
+    ]
+    faces = [
+        [0, 11, 5],
+        [0, 5, 1],
+        [0, 1, 7],
+        [0, 7, 10],
+        [0, 10, 11],
+        [1, 5, 9],
+        [5, 11, 4],
+        [11, 10, 2],
+        [10, 7, 6],
+        [7, 1, 8],
+        [3, 9, 4],
+        [3, 4, 2],
+        [3, 2, 6],
+        [3, 6, 8],
+        [3, 8, 9],
+        [4, 9, 5],
+        [2, 4, 11],
+        [6, 2, 10],
+        [8, 6, 7],
+        [9, 8, 1],
+    ]
+    midpoints = {}
+
+    def midpoint(i, j):
+        edge = (min(i, j), max(i, j))
+        if edge not in midpoints:
+            midpoints[edge] = len(vertices)
+            vertices.append([(a + b) / 2 for a, b in zip(vertices[i], vertices[j])])
+        return midpoints[edge]
+
+    subdivided_faces = []
+    for i, j, k in faces:
+        ij, jk, ki = midpoint(i, j), midpoint(j, k), midpoint(k, i)
+        subdivided_faces += [[i, ij, ki], [j, jk, ij], [k, ki, jk], [ij, jk, ki]]
+
+    vertices = gs.array(vertices)
+    vertices = vertices / gs.linalg.norm(vertices, axis=-1)[..., None]
+    return vertices, gs.array(subdivided_faces)
+
+
+def test_exp_and_log_default_solvers_converge():
+    """Test that exp and log at default settings match converged solutions.
+
+    The reference solutions are computed with much tighter tolerances. A
+    budget of 100 iterations is not enough for the exp on this surface, and
+    leaves it several percent away from the reference.
+    """
+    vertices, faces = _icosphere()
+    tangent_vec = 0.6 * gs.stack(
+        [
+            gs.sin(2 * vertices[:, 2] + vertices[:, 0]),
+            gs.cos(vertices[:, 1]),
+            0.5 * vertices[:, 0] * vertices[:, 1],
+        ],
+        axis=-1,
+    )
+    point = vertices + tangent_vec
+    metric = DiscreteSurfaces(faces=faces).metric
+    metric.exp_solver.n_steps = 3
+    metric.log_solver.n_steps = 3
+
+    exp = metric.exp(tangent_vec, vertices)
+    log = metric.log(point, vertices)
+
+    tight_optimizer = TorchLBFGS(
+        max_iter=20000, tolerance_grad=1e-9, tolerance_change=1e-11
+    )
+    metric.exp_solver.optimizer = tight_optimizer
+    metric.log_solver.optimizer = tight_optimizer
+    expected_exp = metric.exp(tangent_vec, vertices)
+    expected_log = metric.log(point, vertices)
+
+    assert gs.linalg.norm(exp - expected_exp) < 1e-3 * gs.linalg.norm(tangent_vec)
+    assert gs.linalg.norm(log - expected_log) < 1e-3 * gs.linalg.norm(expected_log)